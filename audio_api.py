@@ -1,6 +1,9 @@
-from fastapi import FastAPI, Response
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, Request, Response, Depends
+from fastapi.responses import FileResponse
+from email.utils import parsedate_to_datetime
+from datetime import timezone
 import os
+import time
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -9,31 +12,93 @@ logger = logging.getLogger(__name__)
 app = FastAPI()
 
 AUDIO_FILE_PATH = "C:/Users/Partha/Music/recordings/kho gye.mp3"  # Make sure this is the CORRECT path
+AUDIO_STAT_TTL = 5  # Seconds before the cached stat is refreshed to pick up file changes
+
+audio_stat = None
+audio_stat_checked_at = 0.0
+
+def refresh_audio_stat():
+    global audio_stat, audio_stat_checked_at
+    try:
+        audio_stat = os.stat(AUDIO_FILE_PATH)
+    except OSError:
+        # Missing or unreadable file is reported as 404
+        audio_stat = None
+    audio_stat_checked_at = time.monotonic()
+
+@app.on_event("startup")
+def check_audio_file():
+    """Stat the audio file once at startup instead of on every request"""
+    refresh_audio_stat()
+    if audio_stat is None:
+        logger.warning("Audio file not found: %s", AUDIO_FILE_PATH)
+
+async def get_audio_stat():
+    """Return the cached stat of the audio file, refreshed every AUDIO_STAT_TTL seconds"""
+    if time.monotonic() - audio_stat_checked_at > AUDIO_STAT_TTL:
+        refresh_audio_stat()
+    return audio_stat
+
+def parse_http_date(value: str):
+    """Parse an HTTP date into an aware datetime, or None if it's malformed"""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # HTTP dates are GMT; a "-0000" zone parses as naive
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def audio_response(request: Request, stat_result):
+    """
+    Build a FileResponse for the audio file.
+    FileResponse sets ETag/Last-Modified from the stat and honors Range
+    requests; matching If-None-Match / If-Modified-Since get a 304.
+    """
+    response = FileResponse(AUDIO_FILE_PATH, media_type="audio/mpeg", stat_result=stat_result)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match:
+        etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        not_modified = "*" in etags or response.headers["etag"] in etags
+    elif if_modified_since:
+        since = parse_http_date(if_modified_since)
+        last_modified = parse_http_date(response.headers["last-modified"])
+        not_modified = since is not None and last_modified is not None and since >= last_modified
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(
+            status_code=304,
+            headers={
+                "etag": response.headers["etag"],
+                "last-modified": response.headers["last-modified"]
+            }
+        )
+    return response
 
 @app.get("/audio")
-async def get_audio():
+async def get_audio(request: Request, stat_result=Depends(get_audio_stat)):
     """
     Endpoint to return an MP3 audio file (non-streaming).
     """
-    if not os.path.exists(AUDIO_FILE_PATH):
+    if stat_result is None:
         return Response(status_code=404, content="Audio file not found")
 
-    return FileResponse(AUDIO_FILE_PATH, media_type="audio/mpeg")
+    return audio_response(request, stat_result)
 
 @app.get("/stream_audio")
-async def stream_audio():
+async def stream_audio(request: Request, stat_result=Depends(get_audio_stat)):
     """
     Endpoint to stream an MP3 audio file.
+    FileResponse sends the file in chunks without blocking the event loop
+    (using sendfile where the server supports it).
     """
-    if not os.path.exists(AUDIO_FILE_PATH):
+    if stat_result is None:
         return Response(status_code=404, content="Audio file not found")
 
-    def audio_generator():
-        with open(AUDIO_FILE_PATH, "rb") as f:
-            while chunk := f.read(1024 * 64): # Read in 64KB chunks
-                yield chunk
-
-    return StreamingResponse(audio_generator(), media_type="audio/mpeg")
+    return audio_response(request, stat_result)
 
 if __name__ == "__main__":
     import uvicorn
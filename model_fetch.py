@@ -1,9 +1,20 @@
-from fastapi import FastAPI, HTTPException
-from supabase import create_client
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from supabase import create_client, Client
 import os
+import re
+import asyncio
+import functools
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import asyncpg
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from typing import Optional, List
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
 from pydantic import BaseModel
 
@@ -21,9 +32,15 @@ SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Missing Supabase credentials in .env file")
 
-logger.info(f"Connecting to Supabase at: {SUPABASE_URL}")
+# Direct Postgres connection string (Supavisor pooler) for the hot read paths
+SUPABASE_DB_URL = os.getenv('SUPABASE_DB_URL')
 
-app = FastAPI(title="Model Info API")
+if not SUPABASE_DB_URL:
+    raise ValueError("Missing SUPABASE_DB_URL in .env file")
+
+logger.info("Connecting to Supabase at: %s", SUPABASE_URL)
+
+app = FastAPI(title="Model Info API", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,122 +51,249 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-try:
-    # Initialize Supabase client
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    logger.info("Successfully connected to Supabase")
-    
-    # Verify table exists
+# Compress larger JSON responses (readme/description text) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+@functools.lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Return the shared Supabase client, created on first use"""
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+@app.on_event("startup")
+def connect_supabase():
     try:
-        test_query = supabase.table('models').select("*").limit(1).execute()
-        logger.info("Successfully verified 'models' table exists")
-    except Exception as table_error:
-        logger.error(f"Failed to query 'models' table: {str(table_error)}")
-        raise Exception(f"Table verification failed: {str(table_error)}")
+        # Initialize Supabase client once so requests reuse its connection
+        supabase = get_supabase()
+        logger.info("Successfully connected to Supabase")
         
-except Exception as e:
-    logger.error(f"Failed to connect to Supabase: {str(e)}")
-    raise
+        # Verify table exists
+        try:
+            test_query = supabase.table('models').select("*").limit(1).execute()
+            logger.info("Successfully verified 'models' table exists")
+        except Exception as table_error:
+            logger.error("Failed to query 'models' table: %s", table_error)
+            raise Exception(f"Table verification failed: {str(table_error)}")
+            
+    except Exception as e:
+        logger.error("Failed to connect to Supabase: %s", e)
+        raise
+
+async def init_pg_connection(conn):
+    """Decode json/jsonb columns (tags, specs) into Python objects with orjson"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=orjson.loads,
+            schema="pg_catalog"
+        )
+
+@app.on_event("startup")
+async def configure_executor():
+    # Bound the threads used by asyncio.to_thread for blocking supabase-py calls
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=32))
+
+@app.on_event("startup")
+async def open_pg_pool():
+    # statement_cache_size=0 because Supabase's transaction pooler (port 6543)
+    # does not support prepared statements
+    app.state.pg = await asyncpg.create_pool(
+        SUPABASE_DB_URL,
+        min_size=2,
+        max_size=10,
+        max_inactive_connection_lifetime=1800,
+        statement_cache_size=0,
+        init=init_pg_connection
+    )
+    logger.info("Postgres connection pool created")
+
+@app.on_event("shutdown")
+async def close_pg_pool():
+    await app.state.pg.close()
+
+# Columns returned by list views; the full record (readme etc.) is only
+# served by /model/{model_id} and /models/batch
+MODEL_LIST_COLUMNS = "model_id, author, downloads, likes, pipeline_tag, model_type, last_modified"
+HARDWARE_LIST_COLUMNS = "name,type,manufacturer,memory,performance_score,price"
+
+# In-process cache for read endpoints, keyed by handler name plus arguments
+response_cache = TTLCache(maxsize=1024, ttl=60)
+cache_lock = asyncio.Lock()
+
+def cached(key):
+    """
+    Cache a handler's result using the named keyword arguments as the key
+    Example key: get_model_info:model_id='meta-llama/Llama-2-7b'
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            parts = [f"{name}={kwargs.get(name)!r}" for name in key]
+            cache_key = ":".join([func.__name__, *parts])
+
+            async with cache_lock:
+                if cache_key in response_cache:
+                    return response_cache[cache_key]
+
+            result = await func(**kwargs)
+
+            async with cache_lock:
+                response_cache[cache_key] = result
+            return result
+        return wrapper
+    return decorator
+
+def invalidate_cache(pattern: str):
+    """
+    Evict cached entries whose key matches the given regex
+    Example: invalidate_cache(r"^list_models:")
+    """
+    regex = re.compile(pattern)
+    for cache_key in [k for k in response_cache.keys() if regex.search(k)]:
+        response_cache.pop(cache_key, None)
 
 @app.get("/")
-def read_root():
+def read_root(supabase: Client = Depends(get_supabase)):
     return {
         "message": "Welcome to Model Info API",
         "connection_status": "connected" if supabase else "disconnected"
     }
 
 @app.get("/model/{model_id}")
+@cached(key=("model_id",))
 async def get_model_info(model_id: str):
     """
     Get model information by model ID
     Example: /model/meta-llama/Llama-2-7b
     """
     try:
-        logger.info(f"Fetching model info for: {model_id}")
-        response = supabase.table('models').select("*").eq('model_id', model_id).execute()
+        logger.debug("Fetching model info for: %s", model_id)
+        async with app.state.pg.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM models WHERE model_id = $1", model_id)
         
-        if not response.data:
-            logger.warning(f"Model not found: {model_id}")
+        if not row:
+            logger.warning("Model not found: %s", model_id)
             raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
             
-        logger.info(f"Successfully retrieved model info for: {model_id}")
-        return response.data[0]
+        logger.debug("Successfully retrieved model info for: %s", model_id)
+        return dict(row)
     
     except Exception as e:
-        logger.error(f"Error fetching model info: {str(e)}")
+        logger.error("Error fetching model info: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_models_page_query(conditions, params, limit, offset, after):
+    """
+    Build a models list query ordered by model_id.
+    With an `after` cursor this is a keyset query (model_id > cursor) whose
+    cost doesn't grow with depth; otherwise it falls back to OFFSET.
+    """
+    if after:
+        params.append(after)
+        conditions.append(f"model_id > ${len(params)}")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    params.append(limit)
+    sql = f"SELECT {MODEL_LIST_COLUMNS} FROM models{where} ORDER BY model_id LIMIT ${len(params)}"
+    if not after and offset:
+        params.append(offset)
+        sql += f" OFFSET ${len(params)}"
+    return sql, params
+
+def next_cursor(rows, limit, column):
+    """Cursor for the next page, or None when this page is the last one"""
+    return rows[-1][column] if rows and len(rows) == limit else None
+
 @app.post("/models")
-async def list_models(author: Optional[str] = None, limit: int = 10, offset: int = 0, model_ids: Optional[List[str]] = None):
+@cached(key=("author", "limit", "offset", "after", "model_ids"))
+async def list_models(
+    author: Optional[str] = None,
+    limit: int = 10,
+    offset: int = Query(0, deprecated=True),
+    after: Optional[str] = None,
+    model_ids: Optional[List[str]] = None
+):
     """
     List all models with optional filtering by author
     Example: /models?author=meta-llama&limit=5
+    Pass the returned next_cursor as ?after= to fetch the next page.
     """
     try:
-        logger.info("Attempting to fetch models from Supabase")
-        logger.info(f"Parameters: author={author}, limit={limit}, offset={offset}")
+        logger.debug("Parameters: author=%s limit=%s offset=%s after=%s", author, limit, offset, after)
         
-        # First verify connection
-        if not supabase:
-            raise Exception("Supabase client not initialized")
-            
         # Build query
-        if not model_ids:
-            query = supabase.table('models').select("*")
-        else:
-            query = supabase.table('models').select("*").in_('model_id', model_ids)
-        logger.info("Created base query")
+        conditions = []
+        params = []
+        if model_ids:
+            params.append(model_ids)
+            conditions.append(f"model_id = ANY(${len(params)})")
         
         if author:
-            query = query.eq('author', author)
-            logger.info(f"Added author filter: {author}")
+            params.append(author)
+            conditions.append(f"author = ${len(params)}")
+            
+        sql, params = build_models_page_query(conditions, params, limit, offset, after)
             
         # Execute query with error catching
         try:
-            response = query.range(offset, offset + limit - 1).execute()
-            logger.info(f"Query executed successfully. Found {len(response.data)} models")
+            async with app.state.pg.acquire() as conn:
+                rows = await conn.fetch(sql, *params)
+            models = [dict(row) for row in rows]
+            logger.debug("Query executed successfully. Found %d models", len(models))
         except Exception as query_error:
-            logger.error(f"Query execution failed: {str(query_error)}")
+            logger.error("Query execution failed: %s", query_error)
             raise Exception(f"Database query failed: {str(query_error)}")
         
         return {
-            "models": response.data,
-            "count": len(response.data),
-            "offset": offset,
-            "limit": limit
+            "models": models,
+            "count": len(models),
+            "offset": None if after else offset,
+            "limit": limit,
+            "next_cursor": next_cursor(models, limit, "model_id")
         }
         
     except Exception as e:
-        logger.error(f"Error in list_models: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
+        logger.error("Error in list_models (%s): %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to fetch models: {str(e)}"
         )
 
+# Only fields with a pg_trgm index, so ILIKE '%q%' doesn't seq-scan
+SEARCHABLE_FIELDS = {"model_id", "author"}
+
 @app.get("/search")
+@cached(key=("q", "field", "limit", "offset", "after"))
 async def search_models(
     q: str,
     field: str = "model_id",
     limit: int = 10,
-    offset: int = 0
+    offset: int = Query(0, deprecated=True),
+    after: Optional[str] = None
 ):
     """
-    Search models by any field
+    Search models by model_id or author
     Example: /search?q=llama&field=model_id&limit=5
+    Pass the returned next_cursor as ?after= to fetch the next page.
     """
+    # field is interpolated into the SQL, so only known columns are allowed
+    if field not in SEARCHABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot search on field: {field}")
+
     try:
-        response = supabase.table('models')\
-            .select("*")\
-            .ilike(field, f"%{q}%")\
-            .range(offset, offset + limit - 1)\
-            .execute()
+        sql, params = build_models_page_query(
+            [f"{field} ILIKE $1"], [f"%{q}%"], limit, offset, after
+        )
+        async with app.state.pg.acquire() as conn:
+            rows = await conn.fetch(sql, *params)
+        models = [dict(row) for row in rows]
             
         return {
-            "models": response.data,
-            "count": len(response.data),
-            "offset": offset,
-            "limit": limit
+            "models": models,
+            "count": len(models),
+            "offset": None if after else offset,
+            "limit": limit,
+            "next_cursor": next_cursor(models, limit, "model_id")
         }
         
     except Exception as e:
@@ -173,28 +317,25 @@ async def get_multiple_models(model_ids: ModelIDs):
     }
     """
     try:
-        logger.info(f"Fetching info for {len(model_ids.ids)} models")
+        logger.debug("Fetching info for %d models", len(model_ids.ids))
         
         # Build query for multiple IDs
-        response = supabase.table('models')\
-            .select("*")\
-            .in_('model_id', model_ids.ids)\
-            .execute()
+        async with app.state.pg.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT * FROM models WHERE model_id = ANY($1)",
+                model_ids.ids
+            )
             
-        logger.info(f"Found {len(response.data)} models")
+        logger.debug("Found %d models", len(rows))
         
         # Create a map of model_id to data for easy lookup
-        found_models = {model["model_id"]: model for model in response.data}
+        found_models = {row["model_id"]: dict(row) for row in rows}
         
         # Prepare response maintaining the order of requested IDs
-        results = []
-        not_found = []
-        for model_id in model_ids.ids:
-            if model_id in found_models:
-                results.append(found_models[model_id])
-            else:
-                not_found.append(model_id)
-                logger.warning(f"Model not found: {model_id}")
+        results = [found_models[model_id] for model_id in model_ids.ids if model_id in found_models]
+        not_found = [model_id for model_id in model_ids.ids if model_id not in found_models]
+        if not_found:
+            logger.warning("Models not found: %s", not_found)
         
         return {
             "models": results,
@@ -203,8 +344,7 @@ async def get_multiple_models(model_ids: ModelIDs):
         }
         
     except Exception as e:
-        logger.error(f"Error in batch fetch: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
+        logger.error("Error in batch fetch (%s): %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch models: {str(e)}"
@@ -223,20 +363,21 @@ class HardwareBase(BaseModel):
 
 # Add these new endpoints
 @app.get("/hardware")
+@cached(key=("type", "manufacturer", "min_memory", "limit", "offset"))
 async def list_hardware(
     type: Optional[str] = None,
     manufacturer: Optional[str] = None,
     min_memory: Optional[int] = None,
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    supabase: Client = Depends(get_supabase)
 ):
     """
     List hardware with optional filters
     Example: /hardware?type=GPU&manufacturer=NVIDIA&min_memory=32
     """
     try:
-        logger.info("Attempting to fetch hardware from Supabase")
-        query = supabase.table('hardware').select("*")
+        query = supabase.table('hardware').select(HARDWARE_LIST_COLUMNS)
         
         if type:
             query = query.eq('type', type)
@@ -245,7 +386,8 @@ async def list_hardware(
         if min_memory:
             query = query.gte('memory', min_memory)
             
-        response = query.range(offset, offset + limit - 1).execute()
+        # supabase-py is synchronous, so run the request off the event loop
+        response = await asyncio.to_thread(query.range(offset, offset + limit - 1).execute)
         
         return {
             "hardware": response.data,
@@ -255,39 +397,68 @@ async def list_hardware(
         }
         
     except Exception as e:
-        logger.error(f"Error fetching hardware: {str(e)}")
+        logger.error("Error fetching hardware: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def etag_response(request: Request, content: dict):
+    """
+    Return content with a weak ETag derived from its JSON body,
+    or an empty 304 if the client already has that version.
+    The ETag is weak because GZipMiddleware may send a different encoding.
+    """
+    digest = hashlib.md5(json.dumps(content).encode(), usedforsecurity=False).hexdigest()
+    opaque_tag = f'"{digest}"'
+    etag = f"W/{opaque_tag}"
+
+    # Weak comparison, same rules as audio_api.audio_response
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in etags or opaque_tag in etags:
+            return Response(status_code=304, headers={"ETag": etag})
+    return ORJSONResponse(content, headers={"ETag": etag})
+
 @app.get("/hardware/types")
-async def get_hardware_types():
+async def get_hardware_types(request: Request):
     """Get list of available hardware types"""
+    return etag_response(request, await fetch_hardware_types())
+
+@cached(key=())
+async def fetch_hardware_types():
     try:
-        response = supabase.table('hardware')\
-            .select('type')\
-            .execute()
+        # Let Postgres compute the unique types instead of shipping every row
+        async with app.state.pg.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT DISTINCT type FROM hardware WHERE type IS NOT NULL ORDER BY type"
+            )
         
-        # Get unique types
-        types = list(set(item['type'] for item in response.data))
+        types = [row['type'] for row in rows]
         return {"types": types}
         
     except Exception as e:
-        logger.error(f"Error fetching hardware types: {str(e)}")
+        logger.error("Error fetching hardware types: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/hardware/manufacturers")
-async def get_manufacturers():
+async def get_manufacturers(request: Request):
     """Get list of available manufacturers"""
+    return etag_response(request, await fetch_manufacturers())
+
+@cached(key=())
+async def fetch_manufacturers():
     try:
-        response = supabase.table('hardware')\
-            .select('manufacturer')\
-            .execute()
+        # Let Postgres compute the unique manufacturers instead of shipping every row
+        async with app.state.pg.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT DISTINCT manufacturer FROM hardware "
+                "WHERE manufacturer IS NOT NULL AND manufacturer <> '' ORDER BY manufacturer"
+            )
         
-        # Get unique manufacturers
-        manufacturers = list(set(item['manufacturer'] for item in response.data if item['manufacturer']))
+        manufacturers = [row['manufacturer'] for row in rows]
         return {"manufacturers": manufacturers}
         
     except Exception as e:
-        logger.error(f"Error fetching manufacturers: {str(e)}")
+        logger.error("Error fetching manufacturers: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
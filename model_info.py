@@ -1,9 +1,14 @@
 import os
 from dotenv import load_dotenv
-import requests
+import asyncio
 import csv
 import logging
-from supabase import create_client
+import functools
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from huggingface_hub import HfApi, hf_hub_download, configure_http_backend, constants
+from supabase import create_client, Client
 from datetime import datetime
 
 # Load environment variables
@@ -19,145 +24,187 @@ logger = logging.getLogger(__name__)
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+@functools.lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Return the shared Supabase client, created on first use"""
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+README_MAX_CHARS = 1000  # Readme length kept in the CSV and Supabase
+
+def create_hf_session() -> requests.Session:
+    """Session for huggingface_hub that retries transient gateway errors"""
+    # raise_on_status=False hands the final 5xx response back to the hub so its
+    # own error handling and cache fallback still apply
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 class ModelFetcher:
+    """
+    Fetch model metadata through huggingface_hub.
+    README downloads are cached under ~/.cache/huggingface and revalidated by
+    ETag, so repeat runs skip unchanged files.
+    """
     def __init__(self):
-        self.headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_TOKEN')}"}
-        self.base_url = "https://huggingface.co/api"
+        # Falls back to HF_TOKEN / the saved login when HUGGINGFACE_TOKEN is unset
+        self.token = os.getenv('HUGGINGFACE_TOKEN')
+        self.api = HfApi(token=self.token)
 
-    def get_model_info(self, model_id: str):
+    def _read_readme(self, model_id: str):
         try:
-            # Get model info
-            url = f"{self.base_url}/models/{model_id}"
-            print(f"Fetching model info from: {url}")
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                model_info = response.json()
-                
-                # Get readme content
-                readme_url = f"https://huggingface.co/{model_id}/raw/main/README.md"
-                print(f"Fetching readme from: {readme_url}")
-                readme_response = requests.get(readme_url)
-                readme_content = readme_response.text if readme_response.status_code == 200 else "No README available"
-
-                return {
-                    "model_id": model_id,
-                    "author": model_info.get("author"),
-                    "downloads": model_info.get("downloads"),
-                    "likes": model_info.get("likes"),
-                    "tags": model_info.get("tags", []),
-                    "pipeline_tag": model_info.get("pipeline_tag"),
-                    "description": model_info.get("description"),
-                    "model_type": model_info.get("model_type"),
-                    "readme": readme_content,
-                    "last_modified": model_info.get("lastModified")
-                }
-            else:
-                raise Exception(f"Error fetching model info: {response.text}")
+            readme_path = hf_hub_download(model_id, "README.md", token=self.token)
+        except Exception:
+            return "No README available"
+
+        # Only read the prefix we keep
+        with open(readme_path, encoding='utf-8', errors='ignore') as f:
+            return f.read(README_MAX_CHARS)
+
+    async def get_model_info(self, model_id: str):
+        try:
+            # huggingface_hub is synchronous; fetch info and readme concurrently in threads
+            print(f"Fetching model info and readme for: {model_id}")
+            info, readme_content = await asyncio.gather(
+                asyncio.to_thread(self.api.model_info, model_id),
+                asyncio.to_thread(self._read_readme, model_id)
+            )
+
+            return {
+                "model_id": model_id,
+                "author": info.author,
+                "downloads": info.downloads,
+                "likes": info.likes,
+                "tags": info.tags or [],
+                "pipeline_tag": info.pipeline_tag,
+                "description": getattr(info, "description", None),
+                "model_type": getattr(info, "model_type", None),
+                "readme": readme_content,
+                # Same format as the REST API's lastModified
+                "last_modified": info.last_modified.strftime("%Y-%m-%dT%H:%M:%S.000Z") if info.last_modified else None
+            }
         except Exception as e:
             print(f"Error: {str(e)}")
             return None
 
-def update_supabase(model_data):
+UPSERT_BATCH_SIZE = 100
+
+def format_supabase_data(model_data):
+    # Format the data for Supabase
+    return {
+        "model_id": model_data["model_id"],
+        "author": model_data["author"],
+        "downloads": int(model_data["downloads"]),
+        "likes": int(model_data["likes"]),
+        "tags": model_data["tags"],
+        "pipeline_tag": model_data["pipeline_tag"],
+        "description": model_data["description"],
+        "model_type": model_data["model_type"],
+        "last_modified": model_data["last_modified"],
+        "readme": model_data["readme"],
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+def update_supabase(models_data):
     try:
-        # Format the data for Supabase
-        supabase_data = {
-            "model_id": model_data["model_id"],
-            "author": model_data["author"],
-            "downloads": int(model_data["downloads"]),
-            "likes": int(model_data["likes"]),
-            "tags": model_data["tags"],
-            "pipeline_tag": model_data["pipeline_tag"],
-            "description": model_data["description"],
-            "model_type": model_data["model_type"],
-            "last_modified": model_data["last_modified"],
-            "readme": model_data["readme"][:1000],  # Limiting readme length
-            "updated_at": datetime.utcnow().isoformat()
-        }
-
-        # Specify the table name explicitly
-        result = supabase.table('models').upsert(  # Make sure 'models' matches your table name
-            supabase_data,
-            on_conflict='model_id'
-        ).execute()
-
-        print(f"Successfully updated Supabase for model: {model_data['model_id']}")
+        # Upsert in chunks so a large run is a handful of requests, not one per model
+        for start in range(0, len(models_data), UPSERT_BATCH_SIZE):
+            batch = models_data[start:start + UPSERT_BATCH_SIZE]
+
+            # Specify the table name explicitly
+            result = get_supabase().table('models').upsert(  # Make sure 'models' matches your table name
+                batch,
+                on_conflict='model_id'
+            ).execute()
+
+        print(f"Successfully updated Supabase for {len(models_data)} models")
         return True
 
     except Exception as e:
         print(f"Error updating Supabase: {str(e)}")
         return False
 
-def create_models_csv(urls, output_file="huggingface_models.csv"):
+CSV_HEADERS = [
+    "model_id", "author", "downloads", "likes", 
+    "tags", "pipeline_tag", "description", 
+    "model_type", "last_modified", "readme"
+]
+
+async def create_models_csv(urls, output_file="huggingface_models.csv"):
+    model_ids = [
+        url.split("huggingface.co/")[1].strip('/') if "huggingface.co/" in url else url.strip('/')
+        for url in urls
+    ]
+
+    # Add retries to huggingface_hub's HTTP backend for this run; offline mode
+    # keeps the hub's own backend so it still refuses network calls
+    if not constants.HF_HUB_OFFLINE:
+        configure_http_backend(backend_factory=create_hf_session)
+
+    # Fetch all models concurrently
     fetcher = ModelFetcher()
+    results = await asyncio.gather(*[fetcher.get_model_info(model_id) for model_id in model_ids])
     
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        headers = [
-            "model_id", "author", "downloads", "likes", 
-            "tags", "pipeline_tag", "description", 
-            "model_type", "last_modified", "readme"
-        ]
-        writer.writerow(headers)
-        
-        for url in urls:
-            try:
-                if "huggingface.co/" in url:
-                    model_id = url.split("huggingface.co/")[1].strip('/')
-                else:
-                    model_id = url.strip('/')
+    csv_rows = []
+    supabase_batch = []
+    for model_id, model_info in zip(model_ids, results):
+        try:
+            print(f"\nProcessing model: {model_id}")
+            
+            if model_info:
+                safe_data = {
+                    "model_id": str(model_id or ""),
+                    "author": str(model_info.get("author") or ""),
+                    "downloads": str(model_info.get("downloads") or 0),
+                    "likes": str(model_info.get("likes") or 0),
+                    "tags": model_info.get("tags", []),
+                    "pipeline_tag": str(model_info.get("pipeline_tag") or ""),
+                    "description": str(model_info.get("description") or ""),
+                    "model_type": str(model_info.get("model_type") or ""),
+                    "last_modified": str(model_info.get("last_modified") or ""),
+                    "readme": str(model_info.get("readme") or "")
+                }
                 
-                print(f"\nProcessing model: {model_id}")
-                model_info = fetcher.get_model_info(model_id)
+                # Clean and format data
+                safe_data["description"] = safe_data["description"].replace("\n", " ").strip()
+                safe_data["readme"] = safe_data["readme"].replace("\n", " ").strip()
                 
-                if model_info:
-                    safe_data = {
-                        "model_id": str(model_id or ""),
-                        "author": str(model_info.get("author") or ""),
-                        "downloads": str(model_info.get("downloads") or 0),
-                        "likes": str(model_info.get("likes") or 0),
-                        "tags": model_info.get("tags", []),
-                        "pipeline_tag": str(model_info.get("pipeline_tag") or ""),
-                        "description": str(model_info.get("description") or ""),
-                        "model_type": str(model_info.get("model_type") or ""),
-                        "last_modified": str(model_info.get("last_modified") or ""),
-                        "readme": str(model_info.get("readme") or "")
-                    }
-                    
-                    # Clean and format data
-                    safe_data["description"] = safe_data["description"].replace("\n", " ").strip()
-                    safe_data["readme"] = safe_data["readme"].replace("\n", " ").strip()
-                    
-                    if safe_data["last_modified"]:
-                        safe_data["last_modified"] = safe_data["last_modified"].replace("T", " ").replace(".000Z", "")
-                    
-                    tags_string = ", ".join(safe_data["tags"]) if safe_data["tags"] else ""
-                    
-                    # Write to CSV
-                    writer.writerow([
-                        safe_data["model_id"],
-                        safe_data["author"],
-                        safe_data["downloads"],
-                        safe_data["likes"],
-                        tags_string,
-                        safe_data["pipeline_tag"],
-                        safe_data["description"],
-                        safe_data["model_type"],
-                        safe_data["last_modified"],
-                        safe_data["readme"][:1000]
-                    ])
-
-                    # Update Supabase
-                    update_supabase(safe_data)
-                    print(f"Successfully processed {model_id}")
+                if safe_data["last_modified"]:
+                    safe_data["last_modified"] = safe_data["last_modified"].replace("T", " ").replace(".000Z", "")
                 
-            except Exception as e:
-                print(f"Error processing {model_id}: {str(e)}")
-                writer.writerow([model_id, f"Error: {str(e)}", "", "", "", "", "", "", "", ""])
+                # Queue the CSV row and the batched Supabase upsert
+                csv_rows.append({
+                    **safe_data,
+                    "tags": ", ".join(safe_data["tags"]) if safe_data["tags"] else ""
+                })
+                supabase_batch.append(format_supabase_data(safe_data))
+                print(f"Successfully processed {model_id}")
+            
+        except Exception as e:
+            print(f"Error processing {model_id}: {str(e)}")
+            csv_rows.append({"model_id": model_id, "author": f"Error: {str(e)}"})
+    
+    # Write the whole CSV in one buffered pass
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(csv_rows)
+    
+    # Update Supabase once the CSV is safely written
+    if supabase_batch and not update_supabase(supabase_batch):
+        print("\nCSV file created, but the Supabase update failed; see the error above")
+        return False
     
     print(f"\nCSV file created and Supabase updated successfully!")
+    return True
 
 if __name__ == "__main__":
     models_to_fetch = [
@@ -174,4 +221,4 @@ if __name__ == "__main__":
         
     ]
     
-    create_models_csv(models_to_fetch) 
+    asyncio.run(create_models_csv(models_to_fetch)) 
@@ -0,0 +1,4 @@
+-- Back the DISTINCT queries in /hardware/types and /hardware/manufacturers
+-- with btree indexes so they can be answered from the index alone.
+CREATE INDEX IF NOT EXISTS hardware_type_idx ON hardware (type);
+CREATE INDEX IF NOT EXISTS hardware_manufacturer_idx ON hardware (manufacturer);
@@ -0,0 +1,15 @@
+-- Indexes for the filters used by the API.
+
+-- models.model_id is already unique (the upsert's on_conflict target), so
+-- lookups and keyset pagination on it need no extra index.
+
+-- /models?author=
+CREATE INDEX IF NOT EXISTS models_author_idx ON models (author);
+
+-- /hardware?min_memory= (type and manufacturer are indexed already)
+CREATE INDEX IF NOT EXISTS hardware_memory_idx ON hardware (memory);
+
+-- /search uses ILIKE '%q%', which a btree can't serve; trigram GIN indexes can
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS models_model_id_trgm ON models USING gin (model_id gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS models_author_trgm ON models USING gin (author gin_trgm_ops);